@@ -1,23 +1,50 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
-from .models import Book, Transaction
+from .audit import audit_log
+from .models import AuditEvent, Author, Book, Transaction
 
 
 User = get_user_model()
 
 
+class AuditedAdminMixin:
+    """Record admin creates, edits and deletes in the audit log."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        action = AuditEvent.Action.UPDATE if change else AuditEvent.Action.CREATE
+        audit_log.record(action, request.user, obj, {field: form.cleaned_data.get(field) for field in form.changed_data})
+
+    def delete_model(self, request, obj):
+        audit_log.record(AuditEvent.Action.DELETE, request.user, obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            audit_log.record(AuditEvent.Action.DELETE, request.user, obj)
+        super().delete_queryset(request, queryset)
+
+
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(AuditedAdminMixin, admin.ModelAdmin):
     list_display = ("username", "email", "date_of_membership", "is_active_member", "is_staff")
     list_filter = ("is_active_member", "is_staff", "is_superuser")
     search_fields = ("username", "email")
 
 
+@admin.register(Author)
+class AuthorAdmin(admin.ModelAdmin):
+    list_display = ("name", "sort_key")
+    search_fields = ("name", "sort_key")
+    readonly_fields = ("sort_key",)
+
+
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(AuditedAdminMixin, admin.ModelAdmin):
     list_display = ("title", "author", "isbn", "published_date", "copies_total", "copies_available")
     search_fields = ("title", "author", "isbn")
-    list_filter = ("published_date",)
+    list_filter = ("authors", "published_date")
+    readonly_fields = ("authors",)
 
 
 @admin.register(Transaction)
@@ -26,3 +53,18 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = ("checkout_date", "return_date")
     search_fields = ("user__username", "book__title", "book__isbn")
 
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "action", "actor_username", "object_type", "object_id")
+    list_filter = ("action", "object_type")
+    search_fields = ("actor_username", "object_id")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,254 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Model, QuerySet
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+def _jsonable(value):
+    """Reduce model instances and querysets in a change set to primary keys."""
+    if isinstance(value, Model):
+        return value.pk
+    if isinstance(value, (QuerySet, list, tuple, set)):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+class AuditLog:
+    """
+    Write-behind audit trail.
+
+    ``record()`` appends the event to a per-process spool file and a bounded
+    in-memory queue; a background thread writes the queue to the database with
+    ``bulk_create`` every ``AUDIT_FLUSH_INTERVAL`` seconds, or as soon as
+    ``AUDIT_BATCH_SIZE`` events are waiting, and once more at interpreter exit.
+
+    The spool is rotated on every flush and the rotated segment deleted only
+    after its events are stored, so a crashed worker's events are replayed on
+    the next start. Each worker holds an exclusive lock on its spool and
+    in-flight segment; any spool file nobody has locked was left behind and is
+    replayed. Replays are idempotent thanks to the unique ``event_id``. If the
+    queue is full the event is kept in the spool only and the flush reads it
+    back from there.
+
+    ``record()`` never raises: if the spool cannot be written (disk full, bad
+    ``AUDIT_SPOOL_DIR``) the event is kept in memory only and the error logged.
+    Circulation events are recorded from ``on_commit`` callbacks, so a worker
+    dying between the commit and the spool write still loses that one event.
+    """
+
+    def __init__(self):
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, "AUDIT_ENABLED", True)
+
+    def _start(self):
+        # Runs on first use in every process, including forked workers.
+        if getattr(self, "_spool", None) is not None:
+            # Drop the parent's spool so its lock dies with the parent.
+            self._spool.close()
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=getattr(settings, "AUDIT_QUEUE_SIZE", 10000))
+        self._overflowed = False
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._spool_dir = getattr(settings, "AUDIT_SPOOL_DIR", None)
+        self._spool = None
+        self._segment = 0
+        self._retry = []
+        if self._spool_dir:
+            self._spool_dir = Path(self._spool_dir)
+            # Unique per start: a crashed worker's spool may carry our reused pid.
+            self._spool_path = self._spool_dir / f"audit-{self._pid}-{uuid.uuid4().hex[:8]}.jsonl"
+            try:
+                self._spool_dir.mkdir(parents=True, exist_ok=True)
+                self._spool = self._open_spool()
+            except OSError:
+                logger.exception("Could not open the audit spool in %s; events are kept in memory only", self._spool_dir)
+        self._needs_recovery = self._spool is not None
+        self._thread = threading.Thread(target=self._run, name="audit-log-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def _open_spool(self):
+        """Create the spool already locked, so recovery never sees it unlocked."""
+        tmp_path = self._spool_path.with_name(f".{self._spool_path.name}")
+        spool = open(tmp_path, "a", encoding="utf-8")
+        locks.lock(spool, locks.LOCK_EX)
+        os.replace(tmp_path, self._spool_path)
+        return spool
+
+    def record(self, action, actor, obj, changes=None):
+        """Queue an audit event for ``obj``; never touches the database."""
+        if not self.enabled:
+            return
+        actor = actor if getattr(actor, "is_authenticated", False) else None
+        redacted = getattr(settings, "AUDIT_REDACTED_FIELDS", ("password",))
+        event = {
+            "event_id": str(uuid.uuid4()),
+            "action": action,
+            "actor_id": actor.pk if actor else None,
+            "actor_username": actor.get_username() if actor else "",
+            "object_type": obj._meta.model_name,
+            "object_id": str(obj.pk),
+            "changes": {
+                field: "<redacted>" if field in redacted else _jsonable(value)
+                for field, value in (changes or {}).items()
+            },
+            "created_at": timezone.now(),
+        }
+        line = json.dumps(event, cls=DjangoJSONEncoder)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            if self._spool is not None:
+                try:
+                    # Reaching the OS page cache is enough to survive a process crash.
+                    self._spool.write(line + "\n")
+                    self._spool.flush()
+                    if getattr(settings, "AUDIT_SPOOL_FSYNC", False):
+                        os.fsync(self._spool.fileno())
+                except OSError:
+                    logger.exception("Could not spool %s audit event; it is kept in memory only", action)
+            try:
+                self._queue.put_nowait(line)
+            except queue.Full:
+                if self._spool is None:
+                    logger.warning("Audit queue full and no spool configured; dropping %s event", action)
+                self._overflowed = True
+        if self._overflowed or self._queue.qsize() >= getattr(settings, "AUDIT_BATCH_SIZE", 500):
+            self._wakeup.set()
+
+    def _rotate(self):
+        """
+        Swap in a fresh spool and drain the queue. Returns ``(lines, segment
+        path, segment file)``; the segment stays locked until the file is closed.
+        """
+        with self._lock:
+            lines = []
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            overflowed, self._overflowed = self._overflowed, False
+            segment = segment_file = None
+            if self._spool is not None:
+                self._segment += 1
+                segment = self._spool_path.with_name(f"{self._spool_path.stem}-{self._segment}.batch")
+                os.replace(self._spool_path, segment)
+                segment_file, self._spool = self._spool, self._open_spool()
+        if overflowed and segment is not None:
+            lines = segment.read_text(encoding="utf-8").splitlines()
+        return lines, segment, segment_file
+
+    def _store(self, lines):
+        from .models import AuditEvent, User
+
+        events = []
+        for line in lines:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                # A worker killed mid-write can leave a truncated last line.
+                logger.warning("Skipping unreadable audit spool line: %r", line[:200])
+                continue
+            data["created_at"] = datetime.datetime.fromisoformat(data["created_at"])
+            events.append(AuditEvent(**data))
+        # Actors deleted since the event was queued would fail the whole batch.
+        actor_ids = {event.actor_id for event in events if event.actor_id is not None}
+        existing = set(User.objects.filter(pk__in=actor_ids).values_list("pk", flat=True))
+        for event in events:
+            if event.actor_id not in existing:
+                event.actor_id = None
+        AuditEvent.objects.bulk_create(
+            events, batch_size=getattr(settings, "AUDIT_BATCH_SIZE", 500), ignore_conflicts=True
+        )
+
+    def _recover(self):
+        """Replay spool files left behind by failed flushes or crashed workers."""
+        for path in sorted(self._spool_dir.glob("audit-*")):
+            if path == self._spool_path:
+                continue
+            try:
+                spool = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with spool:
+                if not locks.lock(spool, locks.LOCK_EX | locks.LOCK_NB):
+                    continue  # Still owned by a running worker.
+                try:
+                    if os.stat(path).st_ino != os.fstat(spool.fileno()).st_ino:
+                        continue  # Replayed and removed by another worker meanwhile.
+                except FileNotFoundError:
+                    continue
+                self._store(spool.read().splitlines())
+                path.unlink(missing_ok=True)
+
+    def flush(self):
+        """Write everything queued so far to the database."""
+        if self._pid != os.getpid():
+            return
+        with self._flush_lock:
+            lines, segment, segment_file = self._rotate()
+            if segment is None:
+                lines, self._retry = self._retry + lines, []
+            close_old_connections()
+            try:
+                if lines:
+                    self._store(lines)
+                if segment is not None:
+                    segment.unlink()
+                if self._needs_recovery:
+                    self._recover()
+                    self._needs_recovery = False
+            except DatabaseError:
+                logger.exception("Could not flush %d audit events; will retry", len(lines))
+                if segment is None:
+                    self._retry = lines
+                self._needs_recovery = segment is not None
+            finally:
+                if segment_file is not None:
+                    # Once unlocked, a segment left behind is picked up by recovery.
+                    segment_file.close()
+
+    def _run(self):
+        interval = getattr(settings, "AUDIT_FLUSH_INTERVAL", 1.0)
+        while not self._stopping.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit flush failed")
+
+    def shutdown(self):
+        """Stop the flusher and write out any remaining events."""
+        if self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+audit_log = AuditLog()
@@ -0,0 +1,155 @@
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_isbn(isbn: str) -> str:
+    """Drop the hyphens and spaces catalogs put in ISBNs (``978-0-261-10357-3``)."""
+    return re.sub(r"[\s-]", "", isbn).upper()
+
+
+class AvailabilityIndex:
+    """
+    Per-process map of ``isbn -> (book id, copies available)``.
+
+    The index is loaded once per worker and kept fresh in three ways:
+
+    * after each committed ``Book.save``/``Book.delete``/``Book.objects.delete()``
+      in this process, the affected rows are re-read;
+    * at most every ``AVAILABILITY_INDEX_SYNC_INTERVAL`` seconds, the books
+      named by availability feed events newer than the last one applied are
+      re-read, which picks up checkouts and returns made by other workers;
+    * every ``AVAILABILITY_INDEX_MAX_AGE`` seconds it is reloaded in full, for
+      the changes the feed does not carry (deleted books, edited ISBNs).
+
+    One caller syncs or reloads while the others keep answering from the
+    current snapshot, so lookups in between run no SQL.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._isbn_by_id = {}
+        self._applied_seq = 0
+        self._loaded_at = None
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def max_age(self) -> float:
+        return getattr(settings, "AVAILABILITY_INDEX_MAX_AGE", 60)
+
+    @property
+    def sync_interval(self) -> float:
+        return getattr(settings, "AVAILABILITY_INDEX_SYNC_INTERVAL", 1.0)
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+
+    def is_behind(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._synced_at > self.sync_interval
+
+    def load(self):
+        """Rebuild the index from the database."""
+        from .models import AvailabilityEvent, Book
+
+        # Holding the lock across the query makes concurrent refresh() calls
+        # wait and apply on top of the new snapshot instead of being lost.
+        with self._lock:
+            # Read the feed position first: events committed while the books
+            # are read are applied again by the next sync, which is harmless.
+            applied_seq = AvailabilityEvent.objects.aggregate(last=Max("seq"))["last"] or 0
+            entries, isbn_by_id = {}, {}
+            rows = Book.objects.values_list("id", "isbn", "copies_available")
+            for book_id, isbn, copies_available in rows.iterator():
+                entries[normalize_isbn(isbn)] = (book_id, copies_available)
+                isbn_by_id[book_id] = normalize_isbn(isbn)
+            self._entries, self._isbn_by_id = entries, isbn_by_id
+            self._applied_seq = applied_seq
+            self._loaded_at = self._synced_at = time.monotonic()
+
+    def warm(self):
+        """Load the index at worker startup, leaving it stale if the database is not ready."""
+        try:
+            self.load()
+        except DatabaseError:
+            logger.warning("Could not warm the availability index; it will load on first use.", exc_info=True)
+
+    def sync(self):
+        """Re-read the books named by availability events since the last sync."""
+        from .models import AvailabilityEvent
+
+        # Seqs commit in order, so nothing below the last applied one can still appear.
+        events = AvailabilityEvent.objects.filter(seq__gt=self._applied_seq).order_by("seq")
+        events = list(events.values_list("seq", "book_id"))
+        if events:
+            self.refresh(*{book_id for _, book_id in events})
+            self._applied_seq = events[-1][0]
+        self._synced_at = time.monotonic()
+
+    def refresh(self, *book_ids):
+        """
+        Re-read ``book_ids`` from the database and patch or drop their entries.
+
+        Commit callbacks can run out of commit order, so the current row is read
+        rather than trusting a value captured at save time. Reading under the
+        lock means a later read always wins.
+        """
+        from .models import Book
+
+        with self._lock:
+            rows = Book.objects.filter(pk__in=book_ids).values_list("id", "isbn", "copies_available")
+            current = {book_id: (normalize_isbn(isbn), copies_available) for book_id, isbn, copies_available in rows}
+            for book_id in book_ids:
+                old_isbn = self._isbn_by_id.pop(book_id, None)
+                if old_isbn is not None:
+                    self._entries.pop(old_isbn, None)
+                if book_id in current:
+                    isbn, copies_available = current[book_id]
+                    self._entries[isbn] = (book_id, copies_available)
+                    self._isbn_by_id[book_id] = isbn
+
+    def _catch_up(self):
+        if self._loaded_at is None:
+            # Nothing to serve yet: everyone waits for the first load.
+            with self._reload_lock:
+                if self._loaded_at is None:
+                    self.load()
+        elif self._reload_lock.acquire(blocking=False):
+            # One caller catches up; the others keep answering from the current snapshot.
+            try:
+                if self.is_stale():
+                    self.load()
+                elif self.is_behind():
+                    self.sync()
+            finally:
+                self._reload_lock.release()
+
+    def lookup(self, isbns):
+        """
+        Return ``(found, missing)`` for ``isbns``: ``found`` maps each known
+        ISBN, as given, to ``(book id, copies available)``. Hyphens and spaces
+        are ignored when matching.
+        """
+        if self.is_stale() or self.is_behind():
+            self._catch_up()
+        entries = self._entries
+        found, missing = {}, []
+        for isbn in isbns:
+            entry = entries.get(normalize_isbn(isbn))
+            if entry is None:
+                missing.append(isbn)
+            else:
+                found[isbn] = entry
+        return found, missing
+
+
+availability_index = AvailabilityIndex()
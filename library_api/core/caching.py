@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def user_cache_enabled() -> bool:
+    """
+    Whether per-user responses are cached. ``USER_CACHE_ENABLED = None`` (the
+    default) caches only with a shared backend: with a per-process cache, a
+    checkout would only invalidate the worker that handled it.
+    """
+    enabled = getattr(settings, "USER_CACHE_ENABLED", None)
+    if enabled is None:
+        return not isinstance(caches["default"], LocMemCache)
+    return enabled
+
+
+def _version_key(user_id) -> str:
+    return f"core:user:{user_id}:version"
+
+
+def user_cache_version(user_id) -> int:
+    """
+    Return the current cache version of ``user_id``, part of every per-user key.
+
+    Read it before reading the database: invalidation bumps the version, so an
+    entry computed from data read before a checkout is written under a version
+    nobody asks for anymore.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Start from the clock, not 1, so an evicted version never comes back.
+        version = time.time_ns()
+        if not cache.add(_version_key(user_id), version, timeout=None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def profile_cache_key(user_id, version) -> str:
+    return f"core:user:{user_id}:v{version}:profile"
+
+
+def history_cache_key(user_id, version) -> str:
+    return f"core:user:{user_id}:v{version}:transactions:first-page"
+
+
+def cache_timeout() -> int:
+    return getattr(settings, "USER_CACHE_TIMEOUT", 300)
+
+
+def invalidate_user_cache(user_id):
+    """Retire the cached profile and first history page of ``user_id``."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # No version yet: nothing has been cached for this user.
+        pass
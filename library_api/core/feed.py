@@ -0,0 +1,181 @@
+import asyncio
+import weakref
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import AvailabilityEvent
+
+
+def serialize_event(event):
+    return {
+        "seq": event.seq,
+        "book": event.book_id,
+        "copies_available": event.copies_available,
+        "at": event.created_at.isoformat(),
+    }
+
+
+def compact_events(now=None):
+    """
+    Apply retention and compaction to the availability feed.
+
+    Events older than ``AVAILABILITY_FEED_RETENTION`` are deleted, except the
+    newest event overall. Among events older than
+    ``AVAILABILITY_FEED_COMPACT_AFTER``, only the latest per book is kept, which
+    is all a consumer catching up needs. Returns the number of deleted rows.
+    """
+    now = now or timezone.now()
+    retention = getattr(settings, "AVAILABILITY_FEED_RETENTION", timedelta(days=1))
+    compact_after = getattr(settings, "AVAILABILITY_FEED_COMPACT_AFTER", timedelta(minutes=10))
+
+    # The newest event is always kept so the latest seq never moves backwards,
+    # even if the feed has been idle for longer than the retention period.
+    newest = AvailabilityEvent.objects.aggregate(newest=Max("seq"))["newest"]
+    events = AvailabilityEvent.objects.exclude(seq=newest) if newest else AvailabilityEvent.objects.all()
+    expired, _ = events.filter(created_at__lt=now - retention).delete()
+    old = events.filter(created_at__lt=now - compact_after)
+    latest = old.values("book").annotate(latest_seq=Max("seq")).values("latest_seq")
+    superseded, _ = old.exclude(seq__in=latest).delete()
+    return expired + superseded
+
+
+class _LoopState:
+    """Subscribers, poller and buffer belonging to one event loop."""
+
+    def __init__(self, buffer_size):
+        self.condition = asyncio.Condition()
+        self.recent = deque(maxlen=buffer_size)
+        self.last_seq = None
+        self.subscribers = 0
+        self.poller = None
+        self.ready = None
+
+
+class AvailabilityFeed:
+    """
+    Per-process fan-out of availability events to async subscribers.
+
+    A single poller task reads new events from the database every
+    ``AVAILABILITY_FEED_POLL_INTERVAL`` seconds while anyone is subscribed and
+    keeps the most recent ones in memory. Idle subscribers only wait on an
+    ``asyncio.Condition``, so their cost is one coroutine each and the database
+    sees one query per interval per worker, however many clients are connected.
+
+    asyncio primitives belong to one event loop, so that state is kept per
+    loop. Under ASGI there is one loop per worker; under WSGI every request
+    runs on its own loop and gets no sharing.
+    """
+
+    def __init__(self):
+        self._states = weakref.WeakKeyDictionary()
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState(getattr(settings, "AVAILABILITY_FEED_BUFFER_SIZE", 1000))
+        return state
+
+    @property
+    def poll_interval(self) -> float:
+        return getattr(settings, "AVAILABILITY_FEED_POLL_INTERVAL", 1.0)
+
+    async def latest_seq(self) -> int:
+        result = await AvailabilityEvent.objects.aaggregate(latest=Max("seq"))
+        return result["latest"] or 0
+
+    async def check_cursor(self, since: int):
+        """
+        Return ``(since, truncated)``: ``truncated`` is true if events after
+        ``since`` may have been removed by retention, or if ``since`` is ahead
+        of the feed (a deleted book took the newest events with it), in which
+        case the cursor is moved back to the latest event.
+        """
+        result = await AvailabilityEvent.objects.aaggregate(oldest=Min("seq"), latest=Max("seq"))
+        oldest, latest = result["oldest"] or 0, result["latest"] or 0
+        if since > latest:
+            return latest, True
+        return since, bool(oldest) and since < oldest - 1
+
+    async def _read(self, since, book_ids, limit):
+        qs = AvailabilityEvent.objects.filter(seq__gt=since)
+        if book_ids:
+            qs = qs.filter(book_id__in=book_ids)
+        return [event async for event in qs.order_by("seq")[:limit]]
+
+    def _from_buffer(self, state, since, book_ids, limit):
+        """Events after ``since`` from memory, or ``None`` if the buffer does not reach back that far."""
+        if state.poller is None or state.last_seq is None or since > state.last_seq:
+            return None
+        if since < state.last_seq and (not state.recent or state.recent[0].seq > since + 1):
+            return None
+        events = [
+            event for event in state.recent
+            if event.seq > since and (not book_ids or event.book_id in book_ids)
+        ]
+        return events[:limit]
+
+    async def _poll(self, state):
+        try:
+            state.recent.clear()
+            state.last_seq = await self.latest_seq()
+            state.ready.set()
+            while state.subscribers:
+                await asyncio.sleep(self.poll_interval)
+                qs = AvailabilityEvent.objects.filter(seq__gt=state.last_seq).order_by("seq")
+                events = [event async for event in qs[:state.recent.maxlen]]
+                if events:
+                    state.recent.extend(events)
+                    state.last_seq = events[-1].seq
+                    async with state.condition:
+                        state.condition.notify_all()
+        finally:
+            state.poller = None
+            state.ready.set()
+
+    async def _events_after(self, state, since, book_ids, limit):
+        events = self._from_buffer(state, since, book_ids, limit)
+        if events is None:
+            events = await self._read(since, book_ids, limit)
+        return events
+
+    async def wait_for_events(self, since: int, book_ids=None, timeout: float = 25.0, limit: int = 500):
+        """
+        Return up to ``limit`` events with ``seq > since`` (optionally only for
+        ``book_ids``), waiting up to ``timeout`` seconds for one to appear.
+        """
+        state = self._state()
+        book_ids = set(book_ids or ())
+        if timeout <= 0:
+            return await self._events_after(state, since, book_ids, limit)
+
+        loop = asyncio.get_running_loop()
+        state.subscribers += 1
+        try:
+            if state.poller is None:
+                state.ready = asyncio.Event()
+                state.poller = asyncio.ensure_future(self._poll(state))
+            await state.ready.wait()
+            deadline = loop.time() + timeout
+            while True:
+                seen = state.last_seq
+                events = await self._events_after(state, since, book_ids, limit)
+                remaining = deadline - loop.time()
+                if events or remaining <= 0:
+                    return events
+                async with state.condition:
+                    try:
+                        await asyncio.wait_for(
+                            state.condition.wait_for(lambda: state.last_seq != seen), remaining
+                        )
+                    except asyncio.TimeoutError:
+                        return []
+        finally:
+            state.subscribers -= 1
+
+
+availability_feed = AvailabilityFeed()
@@ -0,0 +1,15 @@
+import django_filters
+
+from .models import Transaction
+
+
+class TransactionHistoryFilter(django_filters.FilterSet):
+    """``?active=true`` for open loans, ``?checkout_date__gte=`` / ``__lte=`` for a date range."""
+
+    active = django_filters.BooleanFilter(field_name="return_date", lookup_expr="isnull")
+
+    class Meta:
+        model = Transaction
+        fields = {
+            "checkout_date": ["gte", "lte"],
+        }
@@ -0,0 +1,65 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.audit import audit_log
+from core.models import AuditEvent, Book, User
+from core.views import TransactionViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Time checkout/return with the audit log disabled and enabled. "
+        "Uses a scratch user and book that are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=500)
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(username=f"bench-{suffix}")
+        book = Book.objects.create(title="Benchmark", author="Bench Mark", isbn=suffix, copies_total=1, copies_available=1)
+        checkout = TransactionViewSet.as_view({"post": "checkout"})
+        return_book = TransactionViewSet.as_view({"post": "return_book"})
+        factory = APIRequestFactory()
+
+        def cycle():
+            timings = []
+            for view, path in ((checkout, "/api/transactions/checkout/"), (return_book, "/api/transactions/return/")):
+                request = factory.post(path, {"book": book.pk}, format="json")
+                force_authenticate(request, user=user)
+                start = time.perf_counter()
+                response = view(request)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code in (200, 201), response.data
+            return timings
+
+        try:
+            self.stdout.write(f"{options['iterations']} checkout/return cycles")
+            self.stdout.write(f"{'audit':<10}{'action':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+            cycle()  # warm up
+            # Interleave the two modes so drift (flushes, caches) hits both alike.
+            results = {False: [], True: []}
+            for _ in range(options["iterations"]):
+                for enabled in (False, True):
+                    with override_settings(AUDIT_ENABLED=enabled):
+                        results[enabled].append(cycle())
+            for enabled in (False, True):
+                for index, action in enumerate(("checkout", "return")):
+                    samples = sorted(result[index] for result in results[enabled])
+                    self.stdout.write(
+                        f"{'on' if enabled else 'off':<10}{action:<10}{statistics.mean(samples):>10.3f}"
+                        f"{samples[len(samples) // 2]:>10.3f}{samples[int(len(samples) * 0.95)]:>10.3f}"
+                    )
+            start = time.perf_counter()
+            audit_log.flush()
+            self.stdout.write(f"final flush: {(time.perf_counter() - start) * 1000:.1f} ms")
+        finally:
+            AuditEvent.objects.filter(object_type="book", object_id=str(book.pk)).delete()
+            book.delete()
+            user.delete()
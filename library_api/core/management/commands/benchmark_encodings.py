@@ -0,0 +1,64 @@
+import datetime
+import gzip
+import time
+
+import brotli
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Author, Book
+from core.serializers import BookSerializer
+from library_api.renderers import MessagePackRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare bytes-on-wire and serialization time of the Book list encodings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100, help="Books per response (default: one large page).")
+        parser.add_argument("--repeat", type=int, default=200, help="Timing iterations per variant.")
+
+    def handle(self, *args, **options):
+        books = [
+            Book(
+                id=i,
+                title=f"Collected Works Volume {i}",
+                author="Terry Pratchett; Neil Gaiman",
+                isbn=f"{9780000000000 + i}",
+                published_date=datetime.date(1990, 1, 1) + datetime.timedelta(days=i),
+                copies_total=5,
+                copies_available=i % 5,
+            )
+            for i in range(1, options["books"] + 1)
+        ]
+        # Unsaved instances cannot hold m2m rows; serialize authors as empty.
+        for book in books:
+            book._prefetched_objects_cache = {"authors": Author.objects.none()}
+
+        factory = APIRequestFactory()
+        variants = [
+            ("all fields", ""),
+            ("?fields=id,copies_available", "?fields=id,copies_available"),
+        ]
+        renderers = [("json", JSONRenderer()), ("msgpack", MessagePackRenderer())]
+
+        self.stdout.write(f"{len(books)} books, {options['repeat']} iterations\n")
+        self.stdout.write(f"{'variant':<30}{'encoding':<10}{'serialize ms':>14}{'render ms':>11}{'raw B':>9}{'gzip B':>9}{'br B':>9}")
+        for label, query in variants:
+            request = Request(factory.get(f"/api/books/{query}"))
+            serialize_ms, data = self._time(options["repeat"], lambda: BookSerializer(books, many=True, context={"request": request}).data)
+            for name, renderer in renderers:
+                render_ms, body = self._time(options["repeat"], lambda: renderer.render(data))
+                self.stdout.write(
+                    f"{label:<30}{name:<10}{serialize_ms:>14.3f}{render_ms:>11.3f}"
+                    f"{len(body):>9}{len(gzip.compress(body)):>9}{len(brotli.compress(body, quality=5)):>9}"
+                )
+
+    def _time(self, repeat, func):
+        result = func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) * 1000 / repeat, result
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.feed import compact_events
+
+
+class Command(BaseCommand):
+    help = "Drop expired availability feed events and collapse old ones to the latest per book."
+
+    def handle(self, *args, **options):
+        deleted = compact_events()
+        self.stdout.write(f"Deleted {deleted} availability events")
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('sort_key', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'ordering': ['sort_key'],
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='authors',
+            field=models.ManyToManyField(blank=True, related_name='books', to='core.author'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+
+# Frozen copies of core.models.split_author_names / normalize_author_name as of
+# this migration, so later changes to the live rules do not alter it.
+def split_author_names(value):
+    return [name.strip() for name in value.split(";") if name.strip()]
+
+
+def normalize_author_name(name):
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    if "," in stripped:
+        last, _, first = stripped.partition(",")
+    else:
+        first, _, last = stripped.rstrip().rpartition(" ")
+    words = re.findall(r"\w+", f"{last} {first}")
+    return " ".join(words)[:255]
+
+
+def populate_authors(apps, schema_editor):
+    """
+    Deduplicate the free-text ``Book.author`` strings into Author rows.
+
+    Books are scanned in primary-key batches; every spelling that maps to the
+    same sort key shares one Author, named after the first spelling seen.
+    """
+    Author = apps.get_model("core", "Author")
+    Book = apps.get_model("core", "Book")
+    BookAuthors = Book.authors.through
+
+    names_by_key = {}
+    keys_by_book = {}
+    for book_id, value in Book.objects.order_by("pk").values_list("pk", "author").iterator(chunk_size=BATCH_SIZE):
+        keys = []
+        for name in split_author_names(value):
+            key = normalize_author_name(name)
+            names_by_key.setdefault(key, name)
+            if key not in keys:
+                keys.append(key)
+        keys_by_book[book_id] = keys
+
+    existing = set(Author.objects.values_list("sort_key", flat=True))
+    Author.objects.bulk_create(
+        [Author(name=name, sort_key=key) for key, name in names_by_key.items() if key not in existing],
+        batch_size=BATCH_SIZE,
+    )
+    author_ids = dict(Author.objects.values_list("sort_key", "pk"))
+
+    links = [
+        BookAuthors(book_id=book_id, author_id=author_ids[key])
+        for book_id, keys in keys_by_book.items()
+        for key in keys
+    ]
+    BookAuthors.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_author"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_populate_authors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityEvent',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('copies_available', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('book', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='availability_events', to='core.book')),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['book', 'seq'], name='availability_event_book_seq')],
+            },
+        ),
+    ]
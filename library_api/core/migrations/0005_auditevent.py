@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:46
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_availabilityevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.UUIDField(editable=False, unique=True)),
+                ('action', models.CharField(choices=[('checkout', 'Checkout'), ('return', 'Return'), ('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=16)),
+                ('actor_username', models.CharField(blank=True, max_length=150)),
+                ('object_type', models.CharField(max_length=32)),
+                ('object_id', models.CharField(max_length=64)),
+                ('changes', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['object_type', 'object_id', 'created_at'], name='audit_object_created'), models.Index(fields=['actor', 'created_at'], name='audit_actor_created'), models.Index(fields=['action', 'created_at'], name='audit_action_created'), models.Index(fields=['created_at'], name='audit_created')],
+            },
+        ),
+    ]
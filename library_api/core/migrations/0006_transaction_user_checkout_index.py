@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_auditevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-checkout_date'], name='transaction_user_checkout'),
+        ),
+    ]
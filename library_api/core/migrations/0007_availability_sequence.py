@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:10
+
+from django.db import migrations, models
+
+
+def seed_sequence(apps, schema_editor):
+    """Continue numbering after the events recorded so far."""
+    AvailabilityEvent = apps.get_model("core", "AvailabilityEvent")
+    AvailabilitySequence = apps.get_model("core", "AvailabilitySequence")
+    last_seq = AvailabilityEvent.objects.aggregate(last=models.Max("seq"))["last"] or 0
+    AvailabilitySequence.objects.create(pk=1, last_seq=last_seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_transaction_user_checkout_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='availabilityevent',
+            name='seq',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(seed_sequence, migrations.RunPython.noop),
+    ]
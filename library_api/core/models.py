@@ -1,8 +1,16 @@
-from django.db import models
+import re
+import unicodedata
+from functools import partial
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from .availability import availability_index
+from .caching import invalidate_user_cache
+
 
 class User(AbstractUser):
     """
@@ -11,18 +19,79 @@ class User(AbstractUser):
     date_of_membership = models.DateField(default=timezone.now)
     is_active_member = models.BooleanField(default=True)
 
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        transaction.on_commit(partial(invalidate_user_cache, self.pk))
+        return result
+
     def __str__(self) -> str:
         return f"{self.username}"
 
 
+def split_author_names(value: str) -> list[str]:
+    """
+    Split a free-text author string into individual names.
+
+    Co-authors are separated with ``;`` (e.g. ``"Good Omens"`` by
+    ``"Terry Pratchett; Neil Gaiman"``).
+    """
+    return [name.strip() for name in value.split(";") if name.strip()]
+
+
+def normalize_author_name(name: str) -> str:
+    """
+    Build the sort key used to deduplicate and browse authors.
+
+    Accents, case and punctuation are dropped and the surname is moved to the
+    front, so ``"J. R. R. Tolkien"``, ``"J.R.R. Tolkien"`` and
+    ``"Tolkien, J.R.R."`` all map to ``"tolkien j r r"``.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    if "," in stripped:
+        last, _, first = stripped.partition(",")
+    else:
+        first, _, last = stripped.rstrip().rpartition(" ")
+    words = re.findall(r"\w+", f"{last} {first}")
+    return " ".join(words)[:255]
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=255)
+    sort_key = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        ordering = ["sort_key"]
+
+    def save(self, *args, **kwargs):
+        if not self.sort_key:
+            self.sort_key = normalize_author_name(self.name)
+        return super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class BookQuerySet(models.QuerySet):
+    def delete(self):
+        # Bulk deletes (e.g. the admin's "delete selected") bypass Book.delete.
+        book_ids = list(self.values_list("pk", flat=True))
+        result = super().delete()
+        transaction.on_commit(partial(availability_index.refresh, *book_ids))
+        return result
+
+
 class Book(models.Model):
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255)
+    authors = models.ManyToManyField(Author, related_name="books", blank=True)
     isbn = models.CharField(max_length=13, unique=True)
     published_date = models.DateField(null=True, blank=True)
     copies_total = models.PositiveIntegerField(default=1)
     copies_available = models.PositiveIntegerField(default=1)
 
+    objects = BookQuerySet.as_manager()
+
     class Meta:
         ordering = ["title", "author"]
 
@@ -32,9 +101,52 @@ class Book(models.Model):
                 "copies_available": "Copies available cannot exceed total copies."
             })
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored value so save() can tell whether it changed.
+        instance._loaded_copies_available = instance.__dict__.get("copies_available", models.DEFERRED)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Also runs when a deferred copies_available is first read.
+        if "copies_available" in self.__dict__ and (fields is None or "copies_available" in fields):
+            self._loaded_copies_available = self.copies_available
+
     def save(self, *args, **kwargs):
         self.full_clean()
-        return super().save(*args, **kwargs)
+        with transaction.atomic():
+            result = super().save(*args, **kwargs)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None or "author" in update_fields:
+                self.sync_authors()
+            saves_copies = update_fields is None or "copies_available" in update_fields
+            if (
+                saves_copies
+                and "copies_available" not in self.get_deferred_fields()
+                and self.copies_available != getattr(self, "_loaded_copies_available", None)
+            ):
+                AvailabilityEvent.objects.create(
+                    seq=AvailabilitySequence.next_seq(), book_id=self.pk, copies_available=self.copies_available
+                )
+                self._loaded_copies_available = self.copies_available
+            transaction.on_commit(partial(availability_index.refresh, self.pk))
+        return result
+
+    def delete(self, *args, **kwargs):
+        transaction.on_commit(partial(availability_index.refresh, self.pk))
+        return super().delete(*args, **kwargs)
+
+    def sync_authors(self):
+        """Link the Author rows named by the free-text ``author`` field."""
+        authors = []
+        for name in split_author_names(self.author):
+            author, _ = Author.objects.get_or_create(
+                sort_key=normalize_author_name(name), defaults={"name": name}
+            )
+            authors.append(author)
+        self.authors.set(authors)
 
     def __str__(self) -> str:
         return f"{self.title} by {self.author}"
@@ -49,13 +161,27 @@ class Transaction(models.Model):
     class Meta:
         ordering = ["-checkout_date"]
         constraints = [
-            # Ensure only one active checkout per (user, book)
+            # Ensure only one active checkout per (user, book); also serves as
+            # the index for a user's active loans
             models.UniqueConstraint(
                 fields=["user", "book"],
                 condition=models.Q(return_date__isnull=True),
                 name="uniq_active_checkout_per_user_book",
             )
         ]
+        indexes = [
+            # Borrowing history: a user's transactions, newest first
+            models.Index(fields=["user", "-checkout_date"], name="transaction_user_checkout"),
+        ]
+
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        transaction.on_commit(partial(invalidate_user_cache, self.user_id))
+        return result
+
+    def delete(self, *args, **kwargs):
+        transaction.on_commit(partial(invalidate_user_cache, self.user_id))
+        return super().delete(*args, **kwargs)
 
     @property
     def is_active(self) -> bool:
@@ -65,3 +191,86 @@ class Transaction(models.Model):
         status = "active" if self.is_active else "returned"
         return f"{self.user.username} → {self.book.title} ({status})"
 
+
+class AvailabilitySequence(models.Model):
+    """Single-row counter handing out ``AvailabilityEvent.seq`` values."""
+    last_seq = models.BigIntegerField(default=0)
+
+    @classmethod
+    def next_seq(cls) -> int:
+        """
+        Allocate the next seq; must be called inside the transaction that writes
+        the event.
+
+        The counter row stays locked until that transaction commits, so a
+        transaction can only take a seq after every lower one has committed or
+        rolled back. Feed readers advancing past ``seq`` therefore never skip a
+        lower seq that commits later, and values are never reused.
+        """
+        sequence, _ = cls.objects.select_for_update().get_or_create(
+            pk=1,
+            defaults={"last_seq": lambda: AvailabilityEvent.objects.aggregate(last=models.Max("seq"))["last"] or 0},
+        )
+        sequence.last_seq += 1
+        sequence.save(update_fields=["last_seq"])
+        return sequence.last_seq
+
+
+class AvailabilityEvent(models.Model):
+    """
+    Append-only change feed entry: ``book`` had ``copies_available`` copies
+    after the change numbered ``seq``. Numbered by ``AvailabilitySequence``.
+    """
+    seq = models.BigIntegerField(primary_key=True)
+    # Covered by the (book, seq) index below.
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="availability_events", db_index=False)
+    copies_available = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["seq"]
+        indexes = [
+            models.Index(fields=["book", "seq"], name="availability_event_book_seq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.seq} {self.book_id} → {self.copies_available}"
+
+
+class AuditEvent(models.Model):
+    """
+    Audit trail entry for circulation and staff edits. Rows are written in
+    batches by ``core.audit.audit_log``, never inline with the request.
+    """
+
+    class Action(models.TextChoices):
+        CHECKOUT = "checkout"
+        RETURN = "return"
+        CREATE = "create"
+        UPDATE = "update"
+        DELETE = "delete"
+
+    # Lets spool replays after a crash skip events that were already flushed
+    event_id = models.UUIDField(unique=True, editable=False)
+    action = models.CharField(max_length=16, choices=Action.choices)
+    # Covered by the (actor, created_at) index below.
+    actor = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name="audit_events", db_index=False
+    )
+    actor_username = models.CharField(max_length=150, blank=True)
+    object_type = models.CharField(max_length=32)
+    object_id = models.CharField(max_length=64)
+    changes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["object_type", "object_id", "created_at"], name="audit_object_created"),
+            models.Index(fields=["actor", "created_at"], name="audit_actor_created"),
+            models.Index(fields=["action", "created_at"], name="audit_action_created"),
+            models.Index(fields=["created_at"], name="audit_created"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.actor_username or '-'} {self.action} {self.object_type}:{self.object_id}"
@@ -1,12 +1,81 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Book, Transaction
+from .models import AuditEvent, Author, Book, Transaction
 
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def requested_fields(request, available):
+    """
+    Return the names from ``available`` selected by ``?fields=`` / ``?omit=``.
+
+    Returns ``None`` when the request does not ask for a sparse fieldset.
+    """
+    params = request.query_params
+    if "fields" not in params and "omit" not in params:
+        return None
+    if "fields" in params:
+        selected = [name for name in params["fields"].split(",") if name in available]
+    else:
+        selected = list(available)
+    omitted = set(params.get("omit", "").split(","))
+    return [name for name in selected if name not in omitted]
+
+
+class SparseFieldsetMixin:
+    """
+    Let read requests narrow a top-level serializer with ``?fields=id,title``
+    or ``?omit=published_date``.
+
+    ``sparse_sources`` maps computed fields to the model fields they read, so
+    ``sparse_queryset()`` can restrict the SQL to the same columns.
+    """
+
+    sparse_sources = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        nested = self.parent is not None and not (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        if request is None or request.method not in ("GET", "HEAD") or nested:
+            return fields
+        keep = requested_fields(request, fields)
+        if keep is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in keep}
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        """Restrict ``queryset`` to the columns and relations a sparse request needs."""
+        if request.method not in ("GET", "HEAD"):
+            return queryset
+        serializer = cls(context={"request": request})
+        if requested_fields(request, serializer.fields) is None:
+            return queryset
+
+        opts = queryset.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+        many_to_many = {field.name for field in opts.many_to_many}
+        columns, prefetch = set(), []
+        for name, field in serializer.fields.items():
+            for source in cls.sparse_sources.get(name, [field.source]):
+                source = source.split(".")[0]
+                if source in concrete:
+                    columns.add(source)
+                elif source in many_to_many:
+                    prefetch.append(source)
+        return (
+            queryset.select_related(None)
+            .prefetch_related(None)
+            .prefetch_related(*prefetch)
+            .only(opts.pk.name, *columns)
+        )
+
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -22,13 +91,25 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "is_active"]
 
 
-class BookSerializer(serializers.ModelSerializer):
+class AuthorSerializer(serializers.ModelSerializer):
+    book_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Author
+        fields = ["id", "name", "sort_key", "book_count"]
+        read_only_fields = ["id", "sort_key"]
+
+
+class BookSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    authors = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
     class Meta:
         model = Book
         fields = [
             "id",
             "title",
             "author",
+            "authors",
             "isbn",
             "published_date",
             "copies_total",
@@ -44,7 +125,9 @@ class BookSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    sparse_sources = {"is_active": ["return_date"]}
+
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
     book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all())
 
@@ -53,3 +136,19 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "book", "checkout_date", "return_date", "is_active"]
         read_only_fields = ["id", "checkout_date", "is_active"]
 
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditEvent
+        fields = [
+            "id",
+            "event_id",
+            "action",
+            "actor",
+            "actor_username",
+            "object_type",
+            "object_id",
+            "changes",
+            "created_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,579 @@
+import asyncio
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+import brotli
+import msgpack
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files import locks
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .audit import AuditLog
+from .availability import AvailabilityIndex, availability_index
+from .caching import invalidate_user_cache, user_cache_enabled
+from .feed import availability_feed, compact_events
+from .models import (
+    AuditEvent, Author, AvailabilityEvent, AvailabilitySequence, Book, Transaction, User,
+    normalize_author_name, split_author_names,
+)
+from .serializers import BookSerializer, TransactionSerializer
+
+
+def make_book(isbn, author="J. R. R. Tolkien", copies=1, **fields):
+    fields.setdefault("title", f"Book {isbn}")
+    return Book.objects.create(
+        isbn=isbn, author=author, copies_total=copies, copies_available=copies, **fields
+    )
+
+
+def set_copies(book, copies):
+    book.copies_available = copies
+    book.save(update_fields=["copies_available"])
+
+
+class AuthorNameTests(SimpleTestCase):
+    def test_split_author_names(self):
+        self.assertEqual(split_author_names(" Terry Pratchett; Neil Gaiman ;"), ["Terry Pratchett", "Neil Gaiman"])
+        self.assertEqual(split_author_names(" ; "), [])
+
+    def test_spellings_share_a_sort_key(self):
+        for name in ("J. R. R. Tolkien", "J.R.R. Tolkien", "Tolkien, J.R.R.", "tolkien,  j r r"):
+            self.assertEqual(normalize_author_name(name), "tolkien j r r", name)
+
+    def test_accents_are_folded(self):
+        self.assertEqual(normalize_author_name("Gabriel García Márquez"), "marquez gabriel garcia")
+        self.assertEqual(normalize_author_name("Plato"), "plato")
+
+
+@override_settings(AUDIT_ENABLED=False)
+class AuthorApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="secret")
+        self.client.force_authenticate(self.user)
+
+    def test_books_are_linked_to_deduplicated_authors(self):
+        make_book("9780000000001", author="J. R. R. Tolkien")
+        make_book("9780000000002", author="Tolkien, J.R.R.; Christopher Tolkien")
+
+        self.assertEqual(Author.objects.count(), 2)
+        tolkien = Author.objects.get(sort_key="tolkien j r r")
+        self.assertEqual(tolkien.name, "J. R. R. Tolkien")
+        self.assertEqual(tolkien.books.count(), 2)
+
+    def test_editing_the_author_string_relinks(self):
+        book = make_book("9780000000001", author="Terry Pratchett")
+        book.author = "Neil Gaiman"
+        book.save()
+        self.assertEqual([author.name for author in book.authors.all()], ["Neil Gaiman"])
+
+    def test_author_books_endpoint(self):
+        make_book("9780000000001", author="Terry Pratchett; Neil Gaiman", title="Good Omens")
+        make_book("9780000000002", author="Terry Pratchett", title="Mort")
+        make_book("9780000000003", author="Neil Gaiman", title="Coraline")
+        gaiman = Author.objects.get(sort_key="gaiman neil")
+
+        response = self.client.get(f"/api/authors/{gaiman.pk}/books/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book["title"] for book in response.data["results"]], ["Coraline", "Good Omens"])
+
+        response = self.client.get("/api/authors/")
+        counts = {author["name"]: author["book_count"] for author in response.data["results"]}
+        self.assertEqual(counts, {"Neil Gaiman": 2, "Terry Pratchett": 2})
+
+
+@override_settings(AUDIT_ENABLED=False)
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="reader", password="secret"))
+        make_book("9780000000001", title="Mort", author="Terry Pratchett", published_date="1987-11-12")
+
+    def sparse_columns(self, serializer_class, queryset, params):
+        request = Request(APIRequestFactory().get("/", params))
+        columns, defer = serializer_class.sparse_queryset(queryset, request).query.deferred_loading
+        self.assertFalse(defer)
+        return set(columns)
+
+    def test_fields_selects_top_level_fields(self):
+        response = self.client.get("/api/books/", {"fields": "id,title,nope"})
+        self.assertEqual(list(response.data["results"][0]), ["id", "title"])
+
+    def test_omit_drops_fields(self):
+        response = self.client.get("/api/books/", {"omit": "authors,published_date"})
+        self.assertEqual(
+            list(response.data["results"][0]),
+            ["id", "title", "author", "isbn", "copies_total", "copies_available"],
+        )
+
+    def test_sparse_queryset_loads_only_requested_columns(self):
+        self.assertEqual(self.sparse_columns(BookSerializer, Book.objects.all(), {"fields": "title"}), {"id", "title"})
+        self.assertEqual(
+            self.sparse_columns(TransactionSerializer, Transaction.objects.all(), {"fields": "book,is_active"}),
+            {"id", "book", "return_date"},
+        )
+
+    def test_full_requests_are_not_restricted(self):
+        request = Request(APIRequestFactory().get("/"))
+        queryset = Book.objects.all()
+        self.assertIs(BookSerializer.sparse_queryset(queryset, request), queryset)
+
+
+@override_settings(AUDIT_ENABLED=False, RESPONSE_COMPRESSION_MIN_SIZE=200)
+class ResponseEncodingTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="reader", password="secret"))
+        for n in range(5):
+            make_book(f"978000000000{n}", title=f"Book number {n}", published_date="2001-01-01")
+
+    def test_msgpack_renderer(self):
+        for kwargs in ({"HTTP_ACCEPT": "application/msgpack"}, {"data": {"format": "msgpack"}}):
+            response = self.client.get("/api/books/", **kwargs)
+            self.assertEqual(response["Content-Type"], "application/msgpack")
+            data = msgpack.unpackb(response.content)
+            self.assertEqual(data["count"], 5)
+            self.assertEqual(data["results"][0]["published_date"], "2001-01-01")
+
+    def test_api_responses_are_compressed(self):
+        response = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(json.loads(brotli.decompress(response.content))["count"], 5)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        response = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_html_and_small_responses_are_not_compressed(self):
+        response = self.client.get("/api/books/", HTTP_ACCEPT="text/html", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        response = self.client.get("/api/books/", {"fields": "id"}, HTTP_ACCEPT_ENCODING="br")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+@override_settings(AUDIT_ENABLED=False)
+class AvailabilityIndexTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="secret")
+        self.client.force_authenticate(self.user)
+        self.book = make_book("9780261103573", copies=2)
+        self.other = make_book("9780000000002")
+        availability_index.load()
+
+    def availability(self, *isbns):
+        response = self.client.post("/api/books/availability/", {"isbns": list(isbns)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_warm_lookup_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            found, missing = availability_index.lookup(["9780261103573", "9780000000009"])
+        self.assertEqual(found, {"9780261103573": (self.book.pk, 2)})
+        self.assertEqual(missing, ["9780000000009"])
+
+    def test_hyphenated_isbns_match_and_are_echoed(self):
+        data = self.availability("978-0-261-10357-3", "978 0000000002", "nope")
+        self.assertEqual(
+            data["found"],
+            {
+                "978-0-261-10357-3": {"id": self.book.pk, "copies_available": 2},
+                "978 0000000002": {"id": self.other.pk, "copies_available": 1},
+            },
+        )
+        self.assertEqual(data["missing"], ["nope"])
+
+    def test_checkout_and_return_refresh_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/transactions/checkout/", {"book": self.book.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.availability("9780261103573")["found"]["9780261103573"]["copies_available"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/transactions/return/", {"book": self.book.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.availability("9780261103573")["found"]["9780261103573"]["copies_available"], 2)
+
+    def test_bulk_delete_drops_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk__in=[self.book.pk, self.other.pk]).delete()
+        self.assertEqual(availability_index.lookup(["9780261103573", "9780000000002"])[0], {})
+
+    @override_settings(AVAILABILITY_INDEX_SYNC_INTERVAL=0)
+    def test_changes_from_other_workers_are_synced_from_the_feed(self):
+        # Another worker's checkout: the row and its feed event, but no local callback.
+        Book.objects.filter(pk=self.book.pk).update(copies_available=1)
+        AvailabilityEvent.objects.create(seq=AvailabilitySequence.next_seq(), book=self.book, copies_available=1)
+
+        with self.assertNumQueries(2):
+            found, _ = availability_index.lookup(["9780261103573"])
+        self.assertEqual(found["9780261103573"], (self.book.pk, 1))
+
+    def test_stale_index_is_reloaded_by_one_caller(self):
+        index = AvailabilityIndex()
+        index.load()
+        index._loaded_at -= index.max_age + 1
+        loads = []
+        reload_started, finish_reload = threading.Event(), threading.Event()
+
+        def slow_load():
+            loads.append(1)
+            reload_started.set()
+            finish_reload.wait(5)
+
+        index.load = slow_load
+        reloader = threading.Thread(target=index.lookup, args=(["9780261103573"],))
+        reloader.start()
+        self.assertTrue(reload_started.wait(5))
+        # Served from the old snapshot while the reload is in progress.
+        self.assertEqual(index.lookup(["9780261103573"])[0], {"9780261103573": (self.book.pk, 2)})
+        finish_reload.set()
+        reloader.join()
+        self.assertEqual(loads, [1])
+
+
+@override_settings(AUDIT_ENABLED=False, USER_CACHE_ENABLED=True)
+class UserHistoryTests(APITestCase):
+    url = "/api/users/me/transactions/"
+
+    def setUp(self):
+        cache.clear()
+        # Reloaded so date_of_membership is a date, as for any request.
+        self.user = User.objects.get(pk=User.objects.create_user(username="reader", password="secret").pk)
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        for n in range(12):
+            Transaction.objects.create(
+                user=self.user,
+                book=make_book(f"97800000000{n:02}"),
+                checkout_date=now - timedelta(days=n),
+                return_date=now if n % 2 else None,
+            )
+        self.book = make_book("9780000000099")
+
+    def test_history_is_paginated_newest_first(self):
+        first = self.client.get(self.url).data
+        self.assertEqual(first["count"], 12)
+        self.assertEqual(len(first["results"]), 10)
+        dates = [row["checkout_date"] for row in first["results"]]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertIsNotNone(first["next"])
+
+        second = self.client.get(self.url, {"page": 2}).data
+        self.assertEqual(len(second["results"]), 2)
+
+    def test_history_filters(self):
+        self.assertEqual(self.client.get(self.url, {"active": "true"}).data["count"], 6)
+        self.assertEqual(self.client.get(self.url, {"active": "false"}).data["count"], 6)
+        since = (timezone.now() - timedelta(days=2, hours=12)).isoformat()
+        self.assertEqual(self.client.get(self.url, {"checkout_date__gte": since}).data["count"], 3)
+        self.assertEqual(self.client.get(self.url, {"checkout_date__gte": "soon"}).status_code, 400)
+
+    def test_first_page_is_served_from_cache(self):
+        expected = self.client.get(self.url).data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data, expected)
+            self.assertEqual(self.client.get(self.url, {"page": 1}).data, expected)
+
+    def test_format_parameter_bypasses_cache(self):
+        self.client.get(self.url, {"format": "json"})
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {"format": "json"})
+
+    def test_own_checkout_and_return_invalidate(self):
+        self.client.get(self.url)
+        self.client.get("/api/users/me/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/transactions/checkout/", {"book": self.book.pk})
+        history = self.client.get(self.url).data
+        self.assertEqual(history["count"], 13)
+        self.assertEqual(history["results"][0]["book"], self.book.pk)
+        self.assertTrue(history["results"][0]["is_active"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/transactions/return/", {"book": self.book.pk})
+        self.assertFalse(self.client.get(self.url).data["results"][0]["is_active"])
+
+    def test_profile_edit_invalidates(self):
+        self.client.get("/api/users/me/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.email = "reader@example.com"
+            self.user.save()
+        self.assertEqual(self.client.get("/api/users/me/").data["email"], "reader@example.com")
+
+    def test_page_read_before_a_checkout_is_not_cached_as_current(self):
+        set_page = cache.set
+
+        def checkout_commits_meanwhile(*args, **kwargs):
+            # The request has read the page; a checkout now commits and invalidates.
+            Transaction.objects.create(user=self.user, book=self.book)
+            invalidate_user_cache(self.user.pk)
+            set_page(*args, **kwargs)
+
+        with mock.patch.object(cache, "set", side_effect=checkout_commits_meanwhile):
+            self.assertEqual(self.client.get(self.url).data["count"], 12)
+        self.assertEqual(self.client.get(self.url).data["count"], 13)
+
+    @override_settings(USER_CACHE_ENABLED=None)
+    def test_process_local_cache_is_not_used_by_default(self):
+        self.assertFalse(user_cache_enabled())
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+class AvailabilitySequenceTests(TestCase):
+    def test_events_are_numbered_by_the_counter(self):
+        book = make_book("9780000000001", copies=2)
+        set_copies(book, 1)
+        set_copies(book, 0)
+
+        seqs = list(AvailabilityEvent.objects.values_list("seq", flat=True))
+        self.assertEqual(seqs, list(range(seqs[0], seqs[0] + 3)))
+        self.assertEqual(AvailabilitySequence.objects.get().last_seq, seqs[-1])
+
+    def test_seqs_are_not_reused_after_events_are_deleted(self):
+        book = make_book("9780000000001")
+        last_seq = AvailabilityEvent.objects.latest("seq").seq
+        AvailabilityEvent.objects.all().delete()
+
+        set_copies(book, 0)
+        self.assertEqual(AvailabilityEvent.objects.get().seq, last_seq + 1)
+
+    def test_saving_other_fields_of_a_deferred_book_appends_nothing(self):
+        book = make_book("9780000000001")
+        count = AvailabilityEvent.objects.count()
+
+        book = Book.objects.only("id", "title", "isbn").get(pk=book.pk)
+        book.title = "Renamed"
+        book.save(update_fields=["title"])
+        book = Book.objects.only("id", "title").get(pk=book.pk)
+        book.save()
+        self.assertEqual(AvailabilityEvent.objects.count(), count)
+
+        book = Book.objects.only("id").get(pk=book.pk)
+        book.copies_available = 0
+        book.save()
+        self.assertEqual(AvailabilityEvent.objects.count(), count + 1)
+
+    def test_unsaved_copies_change_appends_nothing(self):
+        book = make_book("9780000000001")
+        count = AvailabilityEvent.objects.count()
+        book = Book.objects.get(pk=book.pk)
+        book.copies_available = 0
+        book.save(update_fields=["title"])
+        self.assertEqual(AvailabilityEvent.objects.count(), count)
+
+    def test_missing_counter_continues_after_the_latest_event(self):
+        book = make_book("9780000000001")
+        last_seq = AvailabilityEvent.objects.latest("seq").seq
+        AvailabilitySequence.objects.all().delete()
+
+        set_copies(book, 0)
+        self.assertEqual(AvailabilityEvent.objects.latest("seq").seq, last_seq + 1)
+
+
+@override_settings(AVAILABILITY_FEED_POLL_INTERVAL=0.05)
+class AvailabilityFeedTests(TestCase):
+    def setUp(self):
+        self.book = make_book("9780000000001", copies=2)
+        self.other = make_book("9780000000002")
+
+    async def stop_poller(self):
+        poller = availability_feed._state().poller
+        if poller is not None:
+            await poller
+
+    async def test_long_poll_wakes_on_new_event(self):
+        since = await availability_feed.latest_seq()
+        waiter = asyncio.ensure_future(availability_feed.wait_for_events(since, timeout=5))
+        await asyncio.sleep(0.1)
+        self.assertFalse(waiter.done())
+
+        await sync_to_async(set_copies)(self.book, 1)
+        events = await asyncio.wait_for(waiter, 2)
+        self.assertEqual([(event.book_id, event.copies_available) for event in events], [(self.book.pk, 1)])
+        await self.stop_poller()
+
+    async def test_long_poll_ignores_other_books_until_timeout(self):
+        since = await availability_feed.latest_seq()
+        waiter = asyncio.ensure_future(availability_feed.wait_for_events(since, {self.other.pk}, timeout=0.3))
+        await sync_to_async(set_copies)(self.book, 1)
+        self.assertEqual(await waiter, [])
+        await self.stop_poller()
+
+    async def test_changes_endpoint(self):
+        response = await self.async_client.get("/api/books/changes/")
+        since = response.json()["last_seq"]
+        await sync_to_async(set_copies)(self.book, 0)
+
+        response = await self.async_client.get("/api/books/changes/", {"since": since})
+        data = response.json()
+        self.assertEqual([(event["book"], event["copies_available"]) for event in data["events"]], [(self.book.pk, 0)])
+        self.assertEqual(data["last_seq"], since + 1)
+        self.assertFalse(data["truncated"])
+
+        response = await self.async_client.get("/api/books/changes/", {"since": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_check_cursor(self):
+        await sync_to_async(set_copies)(self.book, 1)
+        await sync_to_async(set_copies)(self.book, 0)
+        latest = await availability_feed.latest_seq()
+        oldest = latest - 3
+
+        self.assertEqual(await availability_feed.check_cursor(oldest), (oldest, False))
+        await AvailabilityEvent.objects.filter(seq__lte=oldest + 1).adelete()
+        self.assertEqual(await availability_feed.check_cursor(oldest), (oldest, True))
+        self.assertEqual(await availability_feed.check_cursor(oldest + 1), (oldest + 1, False))
+        # Ahead of the feed, e.g. after the newest events' book was deleted.
+        self.assertEqual(await availability_feed.check_cursor(latest + 5), (latest, True))
+
+    def test_compaction_keeps_latest_per_book(self):
+        now = timezone.now()
+        AvailabilityEvent.objects.all().delete()
+        rows = [
+            (self.book, timedelta(days=2)),
+            (self.other, timedelta(hours=1)),
+            (self.other, timedelta(hours=1)),
+            (self.book, timedelta(hours=1)),
+            (self.other, timedelta(0)),
+        ]
+        for seq, (book, age) in enumerate(rows, start=1):
+            AvailabilityEvent.objects.create(seq=seq, book=book, copies_available=0, created_at=now - age)
+
+        self.assertEqual(compact_events(now), 2)
+        self.assertEqual(list(AvailabilityEvent.objects.values_list("seq", flat=True)), [3, 4, 5])
+
+    def test_compaction_keeps_the_newest_event(self):
+        AvailabilityEvent.objects.update(created_at=timezone.now() - timedelta(days=2))
+        latest = AvailabilityEvent.objects.latest("seq").seq
+
+        compact_events()
+        self.assertEqual(list(AvailabilityEvent.objects.values_list("seq", flat=True)), [latest])
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class AvailabilitySequenceConcurrencyTests(TransactionTestCase):
+    """Needs a database with row locks; SQLite serializes every writer anyway."""
+
+    def test_later_commit_gets_later_seq(self):
+        first, second = make_book("9780000000001"), make_book("9780000000002")
+        seq_taken = threading.Event()
+
+        def checkout(book_id, hold=0):
+            try:
+                with transaction.atomic():
+                    book = Book.objects.select_for_update().get(pk=book_id)
+                    book.copies_available -= 1
+                    book.save(update_fields=["copies_available"])
+                    seq_taken.set()
+                    time.sleep(hold)
+            finally:
+                connection.close()
+
+        # The first checkout takes its seq, then commits after the second one has written.
+        slow = threading.Thread(target=checkout, args=(first.pk, 1.0))
+        slow.start()
+        self.assertTrue(seq_taken.wait(5))
+        fast = threading.Thread(target=checkout, args=(second.pk,))
+        fast.start()
+        time.sleep(0.5)
+        self.assertFalse(AvailabilityEvent.objects.filter(book=second, copies_available=0).exists())
+        slow.join()
+        fast.join()
+
+        events = AvailabilityEvent.objects.filter(copies_available=0).order_by("seq")
+        self.assertEqual([event.book_id for event in events], [first.pk, second.pk])
+
+
+class AuditLogRecoveryTests(TransactionTestCase):
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.spool_dir = spool_dir.name
+        settings_override = override_settings(AUDIT_SPOOL_DIR=self.spool_dir, AUDIT_FLUSH_INTERVAL=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username="librarian", password="secret", is_staff=True)
+
+    def plant_spool(self, name):
+        """Write a spool file as a worker that crashed before flushing would leave it."""
+        event_id = str(uuid.uuid4())
+        event = {
+            "event_id": event_id,
+            "action": AuditEvent.Action.UPDATE,
+            "actor_id": self.user.pk,
+            "actor_username": self.user.username,
+            "object_type": "user",
+            "object_id": str(self.user.pk),
+            "changes": {"email": "librarian@example.com"},
+            "created_at": timezone.now(),
+        }
+        path = os.path.join(self.spool_dir, name)
+        with open(path, "w", encoding="utf-8") as spool:
+            spool.write(json.dumps(event, cls=DjangoJSONEncoder) + "\n")
+        return path, event_id
+
+    def start_log(self):
+        audit_log = AuditLog()
+        self.addCleanup(atexit.unregister, audit_log.shutdown)
+        self.addCleanup(audit_log.shutdown)
+        return audit_log
+
+    def test_replays_spool_left_by_crashed_worker_with_same_pid(self):
+        _, crashed_id = self.plant_spool(f"audit-{os.getpid()}.jsonl")
+        audit_log = self.start_log()
+
+        audit_log.record(AuditEvent.Action.CREATE, self.user, self.user)
+        audit_log.flush()
+
+        self.assertEqual(AuditEvent.objects.count(), 2)
+        self.assertTrue(AuditEvent.objects.filter(event_id=crashed_id).exists())
+        self.assertEqual(os.listdir(self.spool_dir), [audit_log._spool_path.name])
+
+    def test_audit_errors_do_not_fail_a_committed_checkout(self):
+        book = make_book("9780000000001")
+        self.client.force_login(self.user)
+        with mock.patch("core.audit.AuditLog._start", autospec=True, side_effect=OSError("disk full")):
+            with self.assertLogs("django.db.backends.base", "ERROR"):
+                response = self.client.post("/api/transactions/checkout/", {"book": book.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Book.objects.get(pk=book.pk).copies_available, 0)
+
+    def test_unwritable_spool_keeps_events_in_memory(self):
+        audit_log = self.start_log()
+        audit_log.record(AuditEvent.Action.CREATE, self.user, self.user)
+        os.close(audit_log._spool.fileno())
+        with self.assertLogs("core.audit", "ERROR"):
+            audit_log.record(AuditEvent.Action.UPDATE, self.user, self.user)
+        audit_log._spool = None
+
+        audit_log.flush()
+        self.assertEqual(AuditEvent.objects.count(), 2)
+
+    def test_skips_spool_locked_by_running_worker(self):
+        path, live_id = self.plant_spool("audit-1-0123abcd.jsonl")
+        with open(path, encoding="utf-8") as spool:
+            locks.lock(spool, locks.LOCK_EX)
+            audit_log = self.start_log()
+            audit_log.record(AuditEvent.Action.CREATE, self.user, self.user)
+            audit_log.flush()
+
+            self.assertEqual(AuditEvent.objects.count(), 1)
+            self.assertTrue(os.path.exists(path))
+
+        audit_log._needs_recovery = True
+        audit_log.flush()
+        self.assertTrue(AuditEvent.objects.filter(event_id=live_id).exists())
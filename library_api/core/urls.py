@@ -1,12 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, BookViewSet, TransactionViewSet
+from .views import (
+    UserViewSet, AuthorViewSet, BookViewSet, TransactionViewSet, AuditEventViewSet,
+    availability_changes, availability_stream,
+)
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
+router.register(r'authors', AuthorViewSet)
 router.register(r'books', BookViewSet)
 router.register(r'transactions', TransactionViewSet)
+router.register(r'audit', AuditEventViewSet)
 
 urlpatterns = [
+    # Registered ahead of the router so "changes" is not taken as a book id
+    path('books/changes/', availability_changes, name='book-availability-changes'),
+    path('books/changes/stream/', availability_stream, name='book-availability-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,13 +1,28 @@
+import json
+
 from django.db import transaction as db_transaction
+from django.db.models import Count
 from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 
-from .models import Book, Transaction
-from .serializers import UserSerializer, BookSerializer, TransactionSerializer
+from .audit import audit_log
+from .availability import availability_index
+from .caching import cache_timeout, history_cache_key, profile_cache_key, user_cache_enabled, user_cache_version
+from .feed import availability_feed, serialize_event
+from .filters import TransactionHistoryFilter
+from .models import AuditEvent, Author, Book, Transaction
+from .serializers import (
+    UserSerializer, AuthorSerializer, AuditEventSerializer, BookSerializer, TransactionSerializer,
+)
 
 
 User = get_user_model()
@@ -20,31 +35,125 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return bool(request.user and request.user.is_staff)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class SparseFieldsetViewMixin:
+    """Load only the columns a ``?fields=`` / ``?omit=`` request will render."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return self.get_serializer_class().sparse_queryset(queryset, self.request)
+
+
+class AuditedModelMixin:
+    """Record creates, updates and deletes made through the API in the audit log."""
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        audit_log.record(AuditEvent.Action.CREATE, self.request.user, serializer.instance, serializer.validated_data)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        audit_log.record(AuditEvent.Action.UPDATE, self.request.user, serializer.instance, serializer.validated_data)
+
+    def perform_destroy(self, instance):
+        # Logged before the delete while the primary key is still set, as the admin does.
+        audit_log.record(AuditEvent.Action.DELETE, self.request.user, instance)
+        super().perform_destroy(instance)
+
+
+class UserViewSet(AuditedModelMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all().order_by("id")
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "me", "my_transactions", "my_loans"]:
             return [permissions.IsAuthenticated()]
         # Only staff can create/update/delete other users
         return [permissions.IsAdminUser()]
 
+    @staticmethod
+    def _is_cacheable(request) -> bool:
+        # Only the default view is cached. The cached data is rendered per request,
+        # so Accept-negotiated formats share it, but ?format= would be baked into
+        # the pagination links.
+        params = request.query_params
+        return user_cache_enabled() and set(params) <= {"page"} and params.get("page", "1") == "1"
+
     @action(detail=False, methods=["get"], url_path="me")
     def me(self, request):
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        cache_key = None
+        if self._is_cacheable(request):
+            cache_key = profile_cache_key(request.user.pk, user_cache_version(request.user.pk))
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data)
+        data = self.get_serializer(request.user).data
+        if cache_key:
+            cache.set(cache_key, data, cache_timeout())
+        return Response(data)
 
     @action(detail=False, methods=["get"], url_path="me/transactions")
     def my_transactions(self, request):
-        qs = Transaction.objects.filter(user=request.user).select_related("book").order_by("-checkout_date")
-        serializer = TransactionSerializer(qs, many=True)
+        cache_key = None
+        if self._is_cacheable(request):
+            cache_key = history_cache_key(request.user.pk, user_cache_version(request.user.pk))
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data)
+
+        # Served by the (user, -checkout_date) index
+        qs = Transaction.objects.filter(user=request.user).order_by("-checkout_date")
+        filterset = TransactionHistoryFilter(request.query_params, queryset=qs, request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        qs = TransactionSerializer.sparse_queryset(filterset.qs, request)
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(qs)
+        if page is None:
+            return Response(TransactionSerializer(qs, many=True, context=context).data)
+        response = self.get_paginated_response(TransactionSerializer(page, many=True, context=context).data)
+        if cache_key:
+            cache.set(cache_key, response.data, cache_timeout())
+        return response
+
+    @action(detail=False, methods=["get"], url_path="me/loans")
+    def my_loans(self, request):
+        # A single indexed query: by user, restricted to open loans
+        loans = (
+            Transaction.objects.filter(user=request.user, return_date__isnull=True)
+            .order_by("-checkout_date")
+            .values_list("id", "book_id", "book__title", "checkout_date")
+        )
+        loans = [
+            {"transaction": tx_id, "book": book_id, "title": title, "checkout_date": checkout_date}
+            for tx_id, book_id, title, checkout_date in loans
+        ]
+        return Response({"count": len(loans), "loans": loans})
+
+
+class AuthorViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Author.objects.annotate(book_count=Count("books")).order_by("sort_key")
+    serializer_class = AuthorSerializer
+    permission_classes = [IsAdminOrReadOnly]
+    search_fields = ["name", "sort_key"]
+
+    @action(detail=True, methods=["get"], url_path="books")
+    def books(self, request, pk=None):
+        # Walks the (author_id, book_id) index of the through table instead of
+        # scanning Book.author strings.
+        author = self.get_object()
+        qs = Book.objects.filter(authors=author).prefetch_related("authors").order_by("title", "author")
+        qs = BookSerializer.sparse_queryset(qs, request)
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            serializer = BookSerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        serializer = BookSerializer(qs, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
 
-class BookViewSet(viewsets.ModelViewSet):
-    queryset = Book.objects.all()
+class BookViewSet(AuditedModelMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    queryset = Book.objects.prefetch_related("authors")
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrReadOnly]
     filterset_fields = {
@@ -62,8 +171,27 @@ class BookViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"], url_path="availability", permission_classes=[permissions.AllowAny])
+    def availability(self, request):
+        # Answered from the per-process ISBN index; no SQL between its periodic syncs.
+        isbns = request.data.get("isbns")
+        if not isinstance(isbns, list) or not all(isinstance(isbn, str) for isbn in isbns):
+            return Response({"detail": "isbns must be a list of strings"}, status=status.HTTP_400_BAD_REQUEST)
+        max_isbns = getattr(settings, "AVAILABILITY_LOOKUP_MAX_ISBNS", 5000)
+        if len(isbns) > max_isbns:
+            return Response({"detail": f"At most {max_isbns} isbns per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        found, missing = availability_index.lookup(isbns)
+        return Response({
+            "found": {
+                isbn: {"id": book_id, "copies_available": copies_available}
+                for isbn, (book_id, copies_available) in found.items()
+            },
+            "missing": missing,
+        })
+
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class TransactionViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Transaction.objects.select_related("book", "user").all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -90,9 +218,14 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
             if existing:
                 return Response({"detail": "You already have this book checked out"}, status=status.HTTP_400_BAD_REQUEST)
 
-            Transaction.objects.create(user=user, book=book)
+            tx = Transaction.objects.create(user=user, book=book)
             book.copies_available -= 1
             book.save(update_fields=["copies_available"])
+            changes = {"transaction": tx.pk, "copies_available": book.copies_available}
+            # robust: the loan is already committed, so a failed audit record must not 500.
+            db_transaction.on_commit(
+                lambda: audit_log.record(AuditEvent.Action.CHECKOUT, user, book, changes), robust=True
+            )
 
         return Response({"detail": "Checked out successfully"}, status=status.HTTP_201_CREATED)
 
@@ -114,10 +247,96 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
 
             tx.return_date = timezone.now()
             tx.save(update_fields=["return_date"])
-            book.copies_available = models.F("copies_available") + 1  # type: ignore
+            # The row is locked, so a plain increment cannot lose an update.
+            book.copies_available += 1
             book.save(update_fields=["copies_available"])
-            # Refresh to resolve F expression
-            book.refresh_from_db(fields=["copies_available"])
+            changes = {"transaction": tx.pk, "copies_available": book.copies_available}
+            # robust: the loan is already committed, so a failed audit record must not 500.
+            db_transaction.on_commit(
+                lambda: audit_log.record(AuditEvent.Action.RETURN, user, book, changes), robust=True
+            )
 
         return Response({"detail": "Returned successfully"}, status=status.HTTP_200_OK)
 
+
+class AuditEventViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = AuditEvent.objects.all()
+    serializer_class = AuditEventSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filterset_fields = {
+        "action": ["exact"],
+        "object_type": ["exact"],
+        "object_id": ["exact"],
+        "actor": ["exact"],
+        "created_at": ["gte", "lte"],
+    }
+
+
+def _parse_feed_params(request):
+    """Return ``(since, book_ids)`` from ``?since=`` and ``?books=1,2``; raises ``ValueError``."""
+    since = request.GET.get("since") or request.headers.get("Last-Event-ID")
+    since = int(since) if since is not None else None
+    if since is not None and since < 0:
+        raise ValueError("since must be a non-negative integer")
+    books = request.GET.get("books")
+    book_ids = {int(book_id) for book_id in books.split(",") if book_id} if books else set()
+    return since, book_ids
+
+
+@require_GET
+async def availability_changes(request):
+    """
+    Long-poll the availability feed: returns events after ``?since=<seq>`` as
+    soon as there are any, or an empty list after the timeout.
+    """
+    try:
+        since, book_ids = _parse_feed_params(request)
+    except ValueError:
+        return JsonResponse({"detail": "since and books must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+    if since is None:
+        # No cursor yet: hand out the current position to start from.
+        return JsonResponse({"events": [], "last_seq": await availability_feed.latest_seq(), "truncated": False})
+
+    timeout = getattr(settings, "AVAILABILITY_FEED_LONG_POLL_TIMEOUT", 25)
+    since, truncated = await availability_feed.check_cursor(since)
+    events = await availability_feed.wait_for_events(since, book_ids, timeout=0 if truncated else timeout)
+    return JsonResponse({
+        "events": [serialize_event(event) for event in events],
+        "last_seq": events[-1].seq if events else since,
+        "truncated": truncated,
+    })
+
+
+@require_GET
+async def availability_stream(request):
+    """
+    Server-sent events stream of the availability feed. Resumes after
+    ``?since=`` or the ``Last-Event-ID`` header, otherwise starts from now.
+    """
+    try:
+        since, book_ids = _parse_feed_params(request)
+    except ValueError:
+        return JsonResponse({"detail": "since and books must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+    heartbeat = getattr(settings, "AVAILABILITY_FEED_HEARTBEAT", 15)
+
+    async def stream(cursor):
+        if cursor is None:
+            cursor = await availability_feed.latest_seq()
+        else:
+            cursor, truncated = await availability_feed.check_cursor(cursor)
+            if truncated:
+                # Events were dropped or the cursor is stale; the client should refetch books.
+                yield "event: reset\ndata: {}\n\n"
+        while True:
+            events = await availability_feed.wait_for_events(cursor, book_ids, timeout=heartbeat)
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                yield f"id: {event.seq}\nevent: availability\ndata: {json.dumps(serialize_event(event))}\n\n"
+            cursor = events[-1].seq
+
+    response = StreamingHttpResponse(stream(since), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
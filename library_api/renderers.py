@@ -0,0 +1,31 @@
+import datetime
+import decimal
+
+import msgpack
+from rest_framework.renderers import BaseRenderer
+
+
+def _encode_default(obj):
+    """Encode the non-native values DRF leaves in ``serializer.data``."""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError(f"Cannot encode {type(obj).__name__} as MessagePack")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Render responses as MessagePack for clients sending
+    ``Accept: application/msgpack`` (or ``?format=msgpack``).
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +55,11 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'library_api.renderers.MessagePackRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
@@ -62,13 +68,60 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Background writers (audit log flusher) need writes to queue for the
+        # lock instead of failing with "database is locked"
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 AUTH_USER_MODEL = 'core.User'
 
+# Per-user cache of /users/me/ and the first page of /users/me/transactions/.
+# Point CACHES at a shared backend (Redis, Memcached) to enable it: with the
+# per-process LocMemCache an invalidation on checkout/return would only reach
+# the worker that handled it, so USER_CACHE_ENABLED = None leaves caching off.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+USER_CACHE_ENABLED = None
+USER_CACHE_TIMEOUT = 300
+
+# Responses smaller than this many bytes are not gzip/brotli compressed
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+# Only API payloads are compressed; HTML pages with CSRF tokens are not (BREACH)
+RESPONSE_COMPRESSION_MEDIA_TYPES = ('application/json', 'application/msgpack')
+
+# Per-process ISBN availability index: apply availability feed events from
+# other workers at most this often, and reload in full (for deleted books and
+# edited ISBNs) after this many seconds
+AVAILABILITY_INDEX_SYNC_INTERVAL = 1.0
+AVAILABILITY_INDEX_MAX_AGE = 60
+AVAILABILITY_LOOKUP_MAX_ISBNS = 5000
+
+# Availability change feed (run `manage.py compact_availability_feed` periodically)
+AVAILABILITY_FEED_RETENTION = timedelta(days=1)
+AVAILABILITY_FEED_COMPACT_AFTER = timedelta(minutes=10)
+AVAILABILITY_FEED_POLL_INTERVAL = 1.0
+AVAILABILITY_FEED_LONG_POLL_TIMEOUT = 25
+AVAILABILITY_FEED_HEARTBEAT = 15
+
+# Write-behind audit log: events are spooled to AUDIT_SPOOL_DIR and written
+# to the database in batches by a background thread
+AUDIT_ENABLED = True
+AUDIT_SPOOL_DIR = BASE_DIR / 'audit_spool'
+AUDIT_SPOOL_FSYNC = False
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'library_api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
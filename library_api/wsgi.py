@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 
 application = get_wsgi_application()
+
+# Warm the per-process ISBN availability index before the first request.
+from core.availability import availability_index  # noqa: E402
+
+availability_index.warm()